@@ -5,6 +5,25 @@ Python PDK implementation
 
 import kong_pdk
 import json
+import time
+import hashlib
+import threading
+import ssl
+import random
+import base64
+import requests
+from requests.adapters import HTTPAdapter
+from cachetools import TTLCache, TLRUCache
+
+# orjson is much faster on the per-request JSON work; fall back to stdlib json
+# if it is not installed. _json_dumps always returns bytes.
+try:
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    
+    _json_loads = json.loads
 
 # Plugin schema
 Schema = (
@@ -35,6 +54,48 @@ Schema = (
             "default": 0,
             "description": "Number of retries for failed auth service calls"
         }
+    },
+    {
+        "retry_base_delay": {
+            "type": "number",
+            "default": 1.0,
+            "description": "Base delay in seconds for exponential backoff between retries"
+        }
+    },
+    {
+        "retry_max_delay": {
+            "type": "number",
+            "default": 30,
+            "description": "Maximum backoff delay in seconds between retries"
+        }
+    },
+    {
+        "retry_jitter": {
+            "type": "number",
+            "default": 0.5,
+            "description": "Random jitter added to each backoff delay, as a fraction of the delay"
+        }
+    },
+    {
+        "result_cache_ttl": {
+            "type": "number",
+            "default": 30,
+            "description": "Upper bound in seconds for caching successful auth service results, never past the token's exp (0 disables caching)"
+        }
+    },
+    {
+        "cache_maxsize": {
+            "type": "number",
+            "default": 10000,
+            "description": "Maximum number of entries in each auth result cache"
+        }
+    },
+    {
+        "debug_logging": {
+            "type": "boolean",
+            "default": False,
+            "description": "Emit debug logs; off by default so debug messages are not formatted per request"
+        }
     }
 )
 
@@ -42,6 +103,126 @@ Schema = (
 version = "1.0.0"
 priority = 1000
 
+# SSL contexts are built once at import instead of loading the CA bundle per request
+_SSL_CTX_VERIFY = ssl.create_default_context()
+_SSL_CTX_NOVERIFY = ssl.create_default_context()
+_SSL_CTX_NOVERIFY.check_hostname = False
+_SSL_CTX_NOVERIFY.verify_mode = ssl.CERT_NONE
+
+
+class _SSLContextAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that hands a prebuilt SSL context to new pooled connections
+    """
+    
+    def __init__(self, ssl_context, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+
+def _build_session(ssl_context):
+    """
+    Create a keep-alive session for auth service calls
+    Retries are handled by _make_http_request, so the adapters never retry
+    """
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=128, max_retries=0))
+    session.mount('https://', _SSLContextAdapter(ssl_context, pool_connections=32, pool_maxsize=128, max_retries=0))
+    return session
+
+
+# Shared HTTP sessions keyed by ssl_verify so auth service calls reuse pooled
+# keep-alive connections instead of paying a new TCP/TLS handshake per request
+_SESSIONS = {
+    True: _build_session(_SSL_CTX_VERIFY),
+    False: _build_session(_SSL_CTX_NOVERIFY)
+}
+
+# Denied requests are remembered briefly so repeats skip the auth service call
+NEGATIVE_CACHE_TTL = 10
+
+# Length bounds for a plausible JWT, checked before any decoding or network call
+MIN_TOKEN_LENGTH = 20
+MAX_TOKEN_LENGTH = 8192
+
+
+def _looks_like_jwt(token):
+    """
+    A JWT header is base64url JSON, so it always starts with "eyJ" ('{"')
+    """
+    return token.startswith('eyJ')
+
+
+def _is_well_formed_jwt(token):
+    """
+    Cheap structural check: three dot-separated segments within length bounds
+    """
+    return token.count('.') == 2 and MIN_TOKEN_LENGTH < len(token) < MAX_TOKEN_LENGTH
+
+
+def _cache_control_max_age(cache_control):
+    """
+    Return max-age from a Cache-Control header value, 0 for no-store/no-cache,
+    or None if the header does not say
+    """
+    if not cache_control:
+        return None
+    
+    for directive in cache_control.split(','):
+        name, _, value = directive.strip().partition('=')
+        name = name.lower()
+        if name in ('no-store', 'no-cache'):
+            return 0
+        if name == 'max-age':
+            try:
+                return max(int(value.strip('"')), 0)
+            except ValueError:
+                return 0
+    
+    return None
+
+
+def _unverified_exp(token):
+    """
+    Peek at a JWT's exp claim without verifying it; the auth service does the
+    verification, this only bounds how long its answer may be cached
+    Returns: exp as a number, or None if the token has no readable exp
+    """
+    try:
+        payload_b64 = token.split('.')[1]
+        payload = _json_loads(base64.urlsafe_b64decode(payload_b64 + '=' * (-len(payload_b64) % 4)))
+        exp = payload.get('exp')
+    except Exception:
+        return None
+    
+    return exp if isinstance(exp, (int, float)) else None
+
+
+def _header_value(header):
+    """
+    Return a request header as a string, or None
+    The PDK may return the header as a tuple; only its first value is used
+    """
+    if isinstance(header, tuple):
+        return header[0] if header else None
+    
+    return header
+
+
+def _extract_bearer(auth_header):
+    """
+    Return the token from a "Bearer <token>" Authorization header, or None
+    The scheme is matched case-insensitively
+    """
+    if not auth_header or len(auth_header) < 8 or auth_header[:7].lower() != 'bearer ':
+        return None
+    
+    return auth_header[7:]
+
 
 class Plugin:
     """
@@ -51,6 +232,33 @@ class Plugin:
     
     def __init__(self, config):
         self.config = config
+        
+        # Config is immutable per Plugin instance, so derive per-request values once
+        self.auth_service_url = config.get("auth_service_url")
+        self.auth_service_timeout = config.get("auth_service_timeout", 10)
+        self.ssl_verify = config.get("ssl_verify", False)
+        self.retry_count = config.get("retry_count", 0)
+        self.retry_base_delay = config.get("retry_base_delay", 1.0)
+        self.retry_max_delay = config.get("retry_max_delay", 30)
+        self.retry_jitter = config.get("retry_jitter", 0.5)
+        self.debug_logging = config.get("debug_logging", False)
+        
+        # Construct the full auth service URL
+        # Handle both base URL and full endpoint URL configurations
+        if not self.auth_service_url or self.auth_service_url.endswith('/auth/verify'):
+            self.full_auth_url = self.auth_service_url
+        else:
+            self.full_auth_url = f"{self.auth_service_url.rstrip('/')}/auth/verify"
+        
+        # Bounded caches for auth results; neither cache is thread-safe on its own.
+        # Result entries are stored as (lifetime, auth_response) and expire after
+        # their own lifetime, so a cached grant never outlives the token
+        self.cache_maxsize = config.get("cache_maxsize", 10000)
+        self.result_cache_ttl = config.get("result_cache_ttl", 30)
+        self.result_cache = TLRUCache(maxsize=self.cache_maxsize, ttu=lambda key, value, now: now + value[0])
+        self.result_cache_lock = threading.RLock()
+        self.negative_cache = TTLCache(maxsize=self.cache_maxsize, ttl=NEGATIVE_CACHE_TTL)
+        self.negative_cache_lock = threading.RLock()
     
     def access(self, kong):
         """
@@ -58,42 +266,60 @@ class Plugin:
         Calls external auth service to validate requests
         """
         try:
-            # Get plugin configuration from instance variable
-            auth_service_url = self.config.get("auth_service_url")
-            auth_service_timeout = self.config.get("auth_service_timeout", 10)
-            
-            if not auth_service_url:
+            if not self.auth_service_url:
                 kong.log.err("[custom-auth] Missing auth_service_url configuration")
                 return kong.response.exit(500, {"error": "Authentication service not configured"})
             
             # Get request details
             request_path = kong.request.get_path()
             request_method = kong.request.get_method()
-            auth_header = kong.request.get_header("Authorization")
-            
-            # Handle case where header might be returned as tuple
-            if isinstance(auth_header, tuple):
-                auth_header = auth_header[0] if auth_header else None
+            auth_header = _header_value(kong.request.get_header("Authorization"))
             
-            kong.log.debug(f"[custom-auth] Processing auth request for {request_method} {request_path}")
+            if self.debug_logging:
+                kong.log.debug(f"[custom-auth] Processing auth request for {request_method} {request_path}")
             
             if not auth_header:
                 kong.log.warn("[custom-auth] No Authorization header found")
                 return kong.response.exit(401, {"error": "Authorization header required"})
             
-            # Call authentication service
-            is_authorized, auth_response = self._call_auth_service(
-                auth_service_url,
-                auth_service_timeout,
-                request_path,
-                request_method,
-                auth_header,
-                kong
-            )
+            # Reject truncated or oversized JWTs before calling the auth service.
+            # Opaque tokens and other schemes are forwarded for the service to judge
+            token = _extract_bearer(auth_header)
+            if token is not None and _looks_like_jwt(token) and not _is_well_formed_jwt(token):
+                kong.log.warn("[custom-auth] Malformed JWT in Authorization header")
+                return kong.response.exit(401, {"error": "Invalid or expired token"})
+            
+            cache_key = self._result_cache_key(auth_header, request_method, request_path)
             
-            if not is_authorized:
-                kong.log.warn("[custom-auth] Authentication failed")
-                return kong.response.exit(403, {"error": "Access denied"})
+            # Repeated denied requests are rejected from the negative cache
+            negative_result = self._get_negative_result(cache_key)
+            if negative_result is not None:
+                status, body = negative_result
+                return kong.response.exit(status, body)
+            
+            # Check cached auth result before calling the auth service
+            auth_response = self._get_cached_result(cache_key)
+            
+            if auth_response is not None:
+                if self.debug_logging:
+                    kong.log.debug("[custom-auth] Using cached auth service result")
+            else:
+                # Call authentication service
+                is_authorized, auth_response, is_denied, max_age = self._call_auth_service(
+                    request_path,
+                    request_method,
+                    auth_header,
+                    kong
+                )
+                
+                if not is_authorized:
+                    # Only remember explicit denials, not auth service outages
+                    if is_denied:
+                        self._store_negative_result(cache_key, 403, {"error": "Access denied"})
+                    kong.log.warn("[custom-auth] Authentication failed")
+                    return kong.response.exit(403, {"error": "Access denied"})
+                
+                self._store_cached_result(cache_key, auth_response, self._result_lifetime(token, max_age))
             
             # Set user context headers for downstream services
             if auth_response and auth_response.get("authorized"):
@@ -106,23 +332,85 @@ class Plugin:
                 
                 # Set roles as JSON string
                 if user_data.get("roles"):
-                    kong.service.request.set_header("X-Roles", json.dumps(user_data["roles"]))
+                    kong.service.request.set_header("X-Roles", _json_dumps(user_data["roles"]).decode('utf-8'))
                 
                 kong.log.info(f"[custom-auth] Authentication successful for user: {user_data.get('user_id', 'unknown')}")
-                kong.log.debug(f"[custom-auth] User roles: {user_data.get('roles', 'none')}")
+                if self.debug_logging:
+                    kong.log.debug(f"[custom-auth] User roles: {user_data.get('roles', 'none')}")
             
         except Exception as e:
             kong.log.err(f"[custom-auth] Unexpected error: {str(e)}")
             return kong.response.exit(500, {"error": "Internal authentication error"})
     
-    def _call_auth_service(self, auth_service_url, timeout, request_path, request_method, auth_header, kong):
+    def _result_cache_key(self, auth_header, request_method, request_path):
+        """
+        Build the result cache key without keeping the raw credential in memory
+        """
+        token_hash = hashlib.blake2b(auth_header.encode('utf-8'), digest_size=16).hexdigest()
+        return f"{token_hash}:{request_method}:{request_path}"
+    
+    def _result_lifetime(self, token, max_age):
+        """
+        Seconds a granted result may be cached: result_cache_ttl, capped by the
+        auth service's Cache-Control max-age and by the token's exp
+        Returns 0 (do not cache) when neither max-age nor exp is known
+        """
+        exp = _unverified_exp(token) if token is not None and _looks_like_jwt(token) else None
+        if max_age is None and exp is None:
+            return 0
+        
+        lifetime = self.result_cache_ttl
+        if max_age is not None:
+            lifetime = min(lifetime, max_age)
+        if exp is not None:
+            lifetime = min(lifetime, exp - time.time())
+        
+        return lifetime
+    
+    def _get_cached_result(self, cache_key):
+        """
+        Return a cached auth service result, or None if missing or expired
+        """
+        if self.result_cache_ttl <= 0:
+            return None
+        
+        with self.result_cache_lock:
+            entry = self.result_cache.get(cache_key)
+        
+        return entry[1] if entry is not None else None
+    
+    def _store_cached_result(self, cache_key, auth_response, lifetime):
+        """
+        Cache a successful auth service result for lifetime seconds
+        """
+        if lifetime <= 0:
+            return
+        
+        with self.result_cache_lock:
+            self.result_cache[cache_key] = (lifetime, auth_response)
+    
+    def _get_negative_result(self, cache_key):
+        """
+        Return the cached (status, body) rejection, or None if missing or expired
+        """
+        with self.negative_cache_lock:
+            return self.negative_cache.get(cache_key)
+    
+    def _store_negative_result(self, cache_key, status, body):
+        """
+        Cache a (status, body) rejection for NEGATIVE_CACHE_TTL seconds
+        """
+        with self.negative_cache_lock:
+            self.negative_cache[cache_key] = (status, body)
+    
+    def _call_auth_service(self, request_path, request_method, auth_header, kong):
         """
         Call external authentication service for token validation and authorization
+        Returns: (is_authorized, auth_response, is_denied, max_age), is_denied is True only when
+        the auth service itself rejected the request (401/403 or not authorized);
+        max_age is the response's Cache-Control max-age, or None if it sent none
         """
         try:
-            kong.log.debug(f"[custom-auth] Calling external auth service: {auth_service_url}")
-            kong.log.debug(f"[custom-auth] Request details - Method: {request_method}, Path: {request_path}")
-            
             # Prepare payload for auth service
             auth_payload = {
                 "path": request_path,
@@ -130,138 +418,117 @@ class Plugin:
                 "token": auth_header
             }
             
-            kong.log.debug(f"[custom-auth] Auth service payload prepared")
-            
-            # Get additional configuration
-            ssl_verify = self.config.get("ssl_verify", False)
-            retry_count = self.config.get("retry_count", 0)
-            
-            # Construct the full auth service URL
-            # Handle both base URL and full endpoint URL configurations
-            if auth_service_url.endswith('/auth/verify'):
-                full_auth_url = auth_service_url
-            else:
-                full_auth_url = f"{auth_service_url.rstrip('/')}/auth/verify"
-            
-            kong.log.debug(f"[custom-auth] Full auth URL: {full_auth_url}")
-            
             # Call the authentication service
-            success, response_data = self._make_http_request(
-                url=full_auth_url,
+            success, response_data, status_code, max_age = self._make_http_request(
+                url=self.full_auth_url,
                 method="POST",
                 payload=auth_payload,
-                timeout=timeout,
-                ssl_verify=ssl_verify,
-                retry_count=retry_count,
+                timeout=self.auth_service_timeout,
+                ssl_verify=self.ssl_verify,
+                retry_count=self.retry_count,
                 kong=kong
             )
             
             if not success:
                 kong.log.warn(f"[custom-auth] Auth service call failed: {response_data.get('error', 'Unknown error')}")
-                return False, response_data
+                return False, response_data, status_code in (401, 403), None
             
             # Check if user is authorized
             if response_data.get("authorized"):
                 kong.log.info(f"[custom-auth] External auth successful for user: {response_data.get('user_id', 'unknown')}")
-                return True, response_data
+                return True, response_data, False, max_age
             else:
                 kong.log.warn("[custom-auth] External auth service denied access")
-                return False, {"error": "Access denied by auth service"}
+                return False, {"error": "Access denied by auth service"}, True, None
                 
         except Exception as e:
             kong.log.err(f"[custom-auth] Error calling external auth service: {str(e)}")
-            return False, {"error": "Authentication service error"}
+            return False, {"error": "Authentication service error"}, False, None
     
     def _make_http_request(self, url, method, payload, timeout, ssl_verify, retry_count, kong):
         """
         Make HTTP request to external service with retry logic
+        Uses the shared keep-alive session so connections are reused across requests
+        Transient failures (connection errors, timeouts, 5xx) are retried with backoff
+        Returns: (success, response_data, status_code, max_age), status_code is None if
+        no response; max_age is the Cache-Control max-age of a 200 response, or None
         """
-        import urllib.request
-        import urllib.parse
-        import urllib.error
-        import ssl
-        
         for attempt in range(retry_count + 1):
             try:
-                kong.log.debug(f"[custom-auth] HTTP request attempt {attempt + 1} to {url}")
+                if self.debug_logging:
+                    kong.log.debug(f"[custom-auth] HTTP request attempt {attempt + 1} to {url}")
                 
-                # Prepare request data
-                data = json.dumps(payload).encode('utf-8')
-                
-                # Create request
-                req = urllib.request.Request(
+                # Make the request
+                response = _SESSIONS[bool(ssl_verify)].request(
+                    method,
                     url,
-                    data=data,
+                    data=_json_dumps(payload),
                     headers={
                         'Content-Type': 'application/json',
                         'User-Agent': 'Kong-Python-Plugin/1.0'
                     },
-                    method=method
+                    timeout=timeout,
+                    verify=ssl_verify
                 )
+                status_code = response.status_code
                 
-                # Create SSL context
-                if ssl_verify:
-                    ssl_context = ssl.create_default_context()
-                else:
-                    ssl_context = ssl.create_default_context()
-                    ssl_context.check_hostname = False
-                    ssl_context.verify_mode = ssl.CERT_NONE
-                
-                # Make the request
-                kong.log.debug(f"[custom-auth] Making {method} request to {url}")
-                with urllib.request.urlopen(req, timeout=timeout, context=ssl_context) as response:
-                    response_data = response.read().decode('utf-8')
-                    status_code = response.getcode()
-                    
+                if self.debug_logging:
                     kong.log.debug(f"[custom-auth] Auth service response: HTTP {status_code}")
-                    
-                    if status_code == 200:
-                        response_json = json.loads(response_data)
+                
+                if status_code == 200:
+                    response_json = _json_loads(response.content)
+                    if self.debug_logging:
                         kong.log.debug(f"[custom-auth] Auth service response successful")
-                        return True, response_json
-                    elif status_code == 401:
-                        kong.log.warn("[custom-auth] Auth service returned 401 - Invalid token")
-                        return False, {"error": "Invalid or expired token"}
-                    elif status_code == 403:
-                        kong.log.warn("[custom-auth] Auth service returned 403 - Access denied")
-                        return False, {"error": "Access denied"}
-                    else:
-                        kong.log.warn(f"[custom-auth] Auth service returned HTTP {status_code}")
-                        response_json = json.loads(response_data) if response_data else {}
-                        return False, response_json
-                        
-            except urllib.error.HTTPError as e:
-                error_body = e.read().decode('utf-8') if e.fp else ""
-                kong.log.warn(f"[custom-auth] HTTP error {e.code}: {error_body}")
+                    return True, response_json, status_code, _cache_control_max_age(response.headers.get('Cache-Control'))
                 
-                if e.code in [401, 403]:
-                    # Don't retry auth failures
+                response_data = response.text
+                kong.log.warn(f"[custom-auth] HTTP error {status_code}: {response_data}")
+                
+                if status_code < 500:
+                    # Don't retry auth failures or other client errors
                     try:
-                        error_json = json.loads(error_body) if error_body else {}
-                        return False, error_json
+                        error_json = _json_loads(response_data) if response_data else {}
+                        return False, error_json, status_code, None
                     except:
-                        return False, {"error": f"HTTP {e.code}"}
+                        return False, {"error": f"HTTP {status_code}"}, status_code, None
                 
                 if attempt < retry_count:
-                    kong.log.debug(f"[custom-auth] Retrying request (attempt {attempt + 1}/{retry_count + 1})")
+                    self._backoff(attempt, retry_count, kong)
+                    continue
+                else:
+                    return False, {"error": f"HTTP {status_code}: {response_data}"}, status_code, None
+                    
+            except requests.exceptions.Timeout as e:
+                kong.log.warn(f"[custom-auth] Request timed out: {str(e)}")
+                if attempt < retry_count:
+                    self._backoff(attempt, retry_count, kong)
                     continue
                 else:
-                    return False, {"error": f"HTTP {e.code}: {error_body}"}
+                    return False, {"error": f"Timeout error: {str(e)}"}, None, None
                     
-            except urllib.error.URLError as e:
-                kong.log.warn(f"[custom-auth] URL error: {str(e)}")
+            except requests.exceptions.ConnectionError as e:
+                kong.log.warn(f"[custom-auth] Connection error: {str(e)}")
                 if attempt < retry_count:
-                    kong.log.debug(f"[custom-auth] Retrying request (attempt {attempt + 1}/{retry_count + 1})")
+                    self._backoff(attempt, retry_count, kong)
                     continue
                 else:
-                    return False, {"error": f"Connection error: {str(e)}"}
+                    return False, {"error": f"Connection error: {str(e)}"}, None, None
                     
             except Exception as e:
                 kong.log.err(f"[custom-auth] Unexpected error in HTTP request: {str(e)}")
                 if attempt < retry_count:
-                    kong.log.debug(f"[custom-auth] Retrying request (attempt {attempt + 1}/{retry_count + 1})")
+                    self._backoff(attempt, retry_count, kong)
                     continue
                 else:
-                    return False, {"error": f"Request error: {str(e)}"}
+                    return False, {"error": f"Request error: {str(e)}"}, None, None
         
-        return False, {"error": "Max retry attempts exceeded"}
\ No newline at end of file
+        return False, {"error": "Max retry attempts exceeded"}, None, None
+    
+    def _backoff(self, attempt, retry_count, kong):
+        """
+        Sleep before the next retry using capped exponential backoff with jitter
+        """
+        delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)) * (1 + random.uniform(0, self.retry_jitter))
+        if self.debug_logging:
+            kong.log.debug(f"[custom-auth] Retrying request in {delay:.2f}s (attempt {attempt + 2}/{retry_count + 1})")
+        time.sleep(delay)
\ No newline at end of file
@@ -6,11 +6,22 @@ Python PDK implementation
 import kong_pdk
 import json
 import time
+import threading
+import hashlib
+import hmac
 import base64
+import logging
 import requests
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
-import jwt as pyjwt
+from cachetools import TTLCache
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+# orjson is much faster at parsing JWKS responses; fall back to stdlib json
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
 # Plugin schema
 Schema = (
@@ -55,6 +66,13 @@ Schema = (
             "default": False,
             "description": "Whether to verify SSL certificates"
         }
+    },
+    {
+        "cache_maxsize": {
+            "type": "number",
+            "default": 10000,
+            "description": "Maximum number of entries in the rejected-token cache"
+        }
     }
 )
 
@@ -62,6 +80,216 @@ Schema = (
 version = "1.0.0"
 priority = 1000
 
+# RS256 is the only accepted algorithm, so its padding and hash are built once
+RS256_PADDING = padding.PKCS1v15()
+RS256_HASH = hashes.SHA256()
+
+# JWKS state shared by all Plugin instances and keyed by (JWKS URL, ssl_verify),
+# so routes using the same realm share one fetch, one key map and one refresher.
+# ssl_verify is part of the key so keys fetched without TLS verification are
+# never served to a route that requires it.
+# _REALMS_LOCK only guards the registry and is never held during a fetch
+_REALMS = {}
+_REALMS_LOCK = threading.Lock()
+
+# Shared HTTP session so JWKS fetches reuse keep-alive connections to Keycloak
+_SESSION = requests.Session()
+
+# Background threads have no kong.log; warnings reach the plugin server's stderr
+_LOG = logging.getLogger("custom-jwt-auth")
+
+# Rejected tokens are remembered briefly so repeated bad tokens skip validation
+NEGATIVE_CACHE_TTL = 10
+
+# Seconds to wait before retrying a failed JWKS refresh while serving the stale JWKS
+JWKS_RETRY_INTERVAL = 30
+
+# Fraction of cache_ttl after which the background thread refreshes the JWKS
+JWKS_REFRESH_AHEAD_RATIO = 0.8
+
+# Length bounds for a plausible JWT, checked before any decoding or network call
+MIN_TOKEN_LENGTH = 20
+MAX_TOKEN_LENGTH = 8192
+
+
+def _is_well_formed_jwt(token):
+    """
+    Cheap structural check: three dot-separated segments within length bounds
+    """
+    return token.count('.') == 2 and MIN_TOKEN_LENGTH < len(token) < MAX_TOKEN_LENGTH
+
+
+def _header_value(header):
+    """
+    Return a request header as a string, or None
+    The PDK may return the header as a tuple; only its first value is used
+    """
+    if isinstance(header, tuple):
+        return header[0] if header else None
+    
+    return header
+
+
+def _extract_bearer(auth_header):
+    """
+    Return the token from a "Bearer <token>" Authorization header, or None
+    The scheme is matched case-insensitively
+    """
+    if not auth_header or len(auth_header) < 8 or auth_header[:7].lower() != 'bearer ':
+        return None
+    
+    return auth_header[7:]
+
+
+def _base64url_decode(data):
+    """
+    Decode base64url encoded data
+    """
+    # Add padding if needed
+    padding = 4 - len(data) % 4
+    if padding != 4:
+        data += '=' * padding
+    
+    return base64.urlsafe_b64decode(data)
+
+
+def _build_public_keys(jwks):
+    """
+    Build {kid: RSA public key} for every RSA signing key in a JWKS
+    Keys that are not usable for RS256 verification are skipped
+    """
+    keys = {}
+    
+    for key in jwks.get('keys', []):
+        kid = key.get('kid')
+        
+        # Validate key properties
+        if not kid or key.get('kty') != 'RSA' or key.get('use') not in ['sig', None]:
+            continue
+        
+        n = key.get('n')  # Modulus
+        e = key.get('e')  # Exponent
+        
+        if not n or not e:
+            continue
+        
+        try:
+            # Decode base64url values and convert to integers
+            n_int = int.from_bytes(_base64url_decode(n), byteorder='big')
+            e_int = int.from_bytes(_base64url_decode(e), byteorder='big')
+            
+            # Create RSA public key
+            keys[kid] = rsa.RSAPublicNumbers(e_int, n_int).public_key()
+        except Exception:
+            continue
+    
+    return keys
+
+
+class _RealmJWKS:
+    """
+    JWKS keys and refresh state for one Keycloak realm and ssl_verify setting
+    cache_ttl is taken from the most recently created Plugin instance for the
+    realm, so the shared refresher never keeps using a replaced config
+    """
+    
+    def __init__(self, jwks_url, ssl_verify, cache_ttl):
+        self.jwks_url = jwks_url
+        self.ssl_verify = ssl_verify
+        self.lock = threading.Lock()  # Held for the duration of a fetch, per realm
+        self.settings_changed = threading.Event()
+        self.cache_ttl = cache_ttl
+        self.keys = None  # {kid: RSA public key}, replaced in one assignment
+        self.expiry = 0
+        self.last_forced_refresh = 0  # Rate-limits refetches for unknown kids
+        self.refresher = None
+    
+    def configure(self, cache_ttl):
+        """
+        Apply a Plugin instance's cache_ttl, waking the refresher if it changed
+        """
+        if cache_ttl != self.cache_ttl:
+            self.cache_ttl = cache_ttl
+            self.settings_changed.set()
+    
+    def fetch(self):
+        """
+        Fetch JWKS from Keycloak and cache its public keys by kid
+        Callers must hold self.lock
+        Returns: error message, or None on success
+        """
+        jwks_url = self.jwks_url
+        
+        try:
+            response = _SESSION.get(jwks_url, verify=self.ssl_verify, timeout=10)
+            response.raise_for_status()
+            jwks = _json_loads(response.content)
+        except requests.RequestException as e:
+            return f"Failed to fetch JWKS from {jwks_url}: {str(e)}"
+        except json.JSONDecodeError as e:
+            return f"Invalid JWKS response from {jwks_url}: {str(e)}"
+        
+        if not isinstance(jwks, dict):
+            return f"Invalid JWKS response from {jwks_url}: expected a JSON object"
+        
+        # Replace the cached keys in one assignment so readers never see a partial map
+        self.keys = _build_public_keys(jwks)
+        self.expiry = time.time() + self.cache_ttl
+        
+        return None
+    
+    def refresh_periodically(self):
+        """
+        Background loop that refreshes JWKS ahead of expiry, so the access phase
+        only fetches synchronously on a cold start or after failed refreshes
+        """
+        while True:
+            # Any failure must not end the loop: the realm keeps its refresher
+            # registered, so a dead thread would never be replaced
+            try:
+                with self.lock:
+                    error_msg = self.fetch()
+            except Exception as e:
+                error_msg = f"JWKS refresh failed: {str(e)}"
+            
+            if error_msg is None:
+                delay = max(self.cache_ttl * JWKS_REFRESH_AHEAD_RATIO, 1)
+            else:
+                _LOG.warning(f"[custom-jwt] {error_msg}, retrying in {JWKS_RETRY_INTERVAL}s")
+                delay = JWKS_RETRY_INTERVAL
+            
+            # Sleep until the next refresh, or until a new config arrives
+            self.settings_changed.wait(delay)
+            self.settings_changed.clear()
+
+
+def _get_realm(jwks_url, ssl_verify, cache_ttl):
+    """
+    Return the shared JWKS state for a realm and ssl_verify setting,
+    registering it and starting its refresher on first use
+    """
+    cache_key = (jwks_url, bool(ssl_verify))
+    
+    with _REALMS_LOCK:
+        realm = _REALMS.get(cache_key)
+        if realm is None:
+            realm = _REALMS[cache_key] = _RealmJWKS(jwks_url, bool(ssl_verify), cache_ttl)
+        else:
+            realm.configure(cache_ttl)
+        
+        start_refresher = realm.refresher is None
+        if start_refresher:
+            realm.refresher = threading.Thread(
+                target=realm.refresh_periodically,
+                name=f"jwks-refresher-{jwks_url}",
+                daemon=True
+            )
+    
+    if start_refresher:
+        realm.refresher.start()
+    
+    return realm
+
 
 class Plugin:
     """
@@ -70,9 +298,28 @@ class Plugin:
     
     def __init__(self, config):
         self.config = config
-        self.jwks_cache = {}
-        self.cache_expiry = 0
+        
+        # Config is immutable per Plugin instance, so derive per-request values once
+        self.keycloak_base_url = config.get("keycloak_base_url")
+        self.keycloak_realm = config.get("keycloak_realm")
+        self.expected_issuer = config.get("expected_issuer")
+        self.expected_audience = config.get("expected_audience")
+        self.expected_issuer_bytes = (self.expected_issuer or "").encode('utf-8')
+        self.expected_audience_bytes = (self.expected_audience or "").encode('utf-8')
+        self.ssl_verify = config.get("ssl_verify", False)
+        self.jwks_url = f"{self.keycloak_base_url}/realms/{self.keycloak_realm}/protocol/openid-connect/certs"
+        
+        # Bounded TTL cache of rejected tokens; TTLCache is not thread-safe on its own
+        self.cache_maxsize = config.get("cache_maxsize", 10000)
+        self.negative_cache = TTLCache(maxsize=self.cache_maxsize, ttl=NEGATIVE_CACHE_TTL)
+        self.negative_cache_lock = threading.RLock()
         self.cache_ttl = config.get("cache_ttl", 3600)  # Use config value or default to 1 hour
+        
+        # Preload and keep refreshing the JWKS off the request path,
+        # with a single refresher per realm shared by all Plugin instances
+        self.jwks = None
+        if self.keycloak_base_url and self.keycloak_realm:
+            self.jwks = _get_realm(self.jwks_url, self.ssl_verify, self.cache_ttl)
     
     def access(self, kong):
         """
@@ -80,22 +327,12 @@ class Plugin:
         Validates JWT tokens using Keycloak JWKS
         """
         try:
-            # Get plugin configuration from instance variable
-            keycloak_base_url = self.config.get("keycloak_base_url")
-            keycloak_realm = self.config.get("keycloak_realm")
-            expected_issuer = self.config.get("expected_issuer")
-            expected_audience = self.config.get("expected_audience")
-            
-            if not all([keycloak_base_url, keycloak_realm, expected_issuer, expected_audience]):
+            if not all([self.keycloak_base_url, self.keycloak_realm, self.expected_issuer, self.expected_audience]):
                 kong.log.err("[custom-jwt] Missing required configuration")
                 return kong.response.exit(500, {"error": "Plugin configuration error"})
             
             # Get Authorization header
-            auth_header = kong.request.get_header("Authorization")
-            
-            # Handle case where header might be returned as tuple
-            if isinstance(auth_header, tuple):
-                auth_header = auth_header[0] if auth_header else None
+            auth_header = _header_value(kong.request.get_header("Authorization"))
             
             if not auth_header:
                 kong.log.info("[custom-jwt] No Authorization header found")
@@ -105,26 +342,39 @@ class Plugin:
                 })
             
             # Extract token from Bearer authorization
-            if not auth_header.startswith("Bearer "):
+            jwt_token = _extract_bearer(auth_header)
+            if jwt_token is None:
                 kong.log.info("[custom-jwt] Invalid Authorization header format")
                 return kong.response.exit(401, {
                     "error": "Invalid Authorization Format",
                     "message": "Authorization header must start with 'Bearer '"
                 })
             
-            jwt_token = auth_header[7:]  # Remove "Bearer " prefix
+            # Reject malformed tokens before touching JWKS or decoding anything
+            if not _is_well_formed_jwt(jwt_token):
+                kong.log.info("[custom-jwt] Malformed JWT token")
+                return kong.response.exit(401, {
+                    "error": "Invalid Token",
+                    "message": "Malformed JWT token"
+                })
+            
+            # Repeated invalid tokens are rejected from the negative cache
+            token_hash = hashlib.blake2b(jwt_token.encode('utf-8'), digest_size=16).hexdigest()
+            error_msg = self._get_negative_result(token_hash)
+            if error_msg is not None:
+                return kong.response.exit(401, {
+                    "error": "Invalid Token",
+                    "message": error_msg
+                })
             
             # Validate JWT token
-            is_valid, payload, error_msg = self._validate_jwt(
-                jwt_token, 
-                keycloak_base_url, 
-                keycloak_realm,
-                expected_issuer,
-                expected_audience,
-                self.config.get("ssl_verify", False)
-            )
+            is_valid, payload, error_msg, is_permanent_failure = self._validate_jwt(jwt_token, kong)
             
             if not is_valid:
+                # Only remember failures caused by the token itself, not JWKS outages
+                # or a token that is not valid yet
+                if is_permanent_failure:
+                    self._store_negative_result(token_hash, error_msg)
                 kong.log.warn(f"[custom-jwt] JWT validation failed: {error_msg}")
                 return kong.response.exit(401, {
                     "error": "Invalid Token",
@@ -154,161 +404,199 @@ class Plugin:
                 "message": "Authentication service error"
             })
     
-    def _validate_jwt(self, token, keycloak_base_url, realm, expected_issuer, expected_audience, ssl_verify):
+    def _validate_jwt(self, token, kong):
         """
         Validate JWT token using Keycloak's public key from JWKS endpoint
-        Returns: (is_valid, payload, error_message)
+        The token is split and decoded once and the RS256 signature is verified
+        directly with cryptography, skipping pyjwt's generic decode path
+        Returns: (is_valid, payload, error_message, is_permanent_failure)
         """
         try:
+            header_b64, payload_b64, signature_b64 = token.split('.')
+            
             # First, decode JWT header to get the key ID (kid)
             try:
-                header = pyjwt.get_unverified_header(token)
+                header = _json_loads(_base64url_decode(header_b64))
                 kid = header.get('kid')
-                alg = header.get('alg', 'RS256')
+                alg = header.get('alg')
                 
+                # The header must name RS256 explicitly; a missing alg is rejected
                 if alg != 'RS256':
-                    return False, None, f"Unsupported algorithm: {alg}"
+                    return False, None, f"Unsupported algorithm: {alg}", True
                 
                 if not kid:
-                    return False, None, "Missing key ID (kid) in JWT header"
+                    return False, None, "Missing key ID (kid) in JWT header", True
                     
             except Exception as e:
-                return False, None, f"Invalid JWT header: {str(e)}"
+                return False, None, f"Invalid JWT header: {str(e)}", True
             
             # Get public key from JWKS
-            public_key, error_msg = self._get_public_key_from_jwks(
-                keycloak_base_url, realm, kid, ssl_verify
-            )
+            public_key, error_msg = self._get_public_key_from_jwks(kid, kong)
             
             if not public_key:
-                return False, None, error_msg or "Failed to get public key"
+                return False, None, error_msg or "Failed to get public key", False
             
-            # Validate JWT signature and claims
+            # Verify the RS256 signature over "<header>.<payload>"
             try:
-                # Decode and verify the token
-                payload = pyjwt.decode(
-                    token,
-                    public_key,
-                    algorithms=['RS256'],
-                    issuer=expected_issuer,
-                    audience=expected_audience,
-                    options={
-                        'verify_signature': True,
-                        'verify_exp': True,
-                        'verify_nbf': True,
-                        'verify_iat': True,
-                        'verify_aud': True,
-                        'verify_iss': True,
-                        'require_exp': True,
-                        'require_iat': True,
-                        'require_nbf': False
-                    }
-                )
-                
-                return True, payload, None
-                
-            except pyjwt.ExpiredSignatureError:
-                return False, None, "Token has expired"
-            except pyjwt.InvalidTokenError as e:
-                return False, None, f"Invalid token: {str(e)}"
-            except pyjwt.InvalidIssuerError:
-                return False, None, f"Invalid issuer: expected {expected_issuer}"
-            except pyjwt.InvalidAudienceError:
-                return False, None, f"Invalid audience: expected {expected_audience}"
-            except pyjwt.InvalidSignatureError:
-                return False, None, "Invalid token signature"
+                signature = _base64url_decode(signature_b64)
+                signing_input = f"{header_b64}.{payload_b64}".encode('ascii')
+                public_key.verify(signature, signing_input, RS256_PADDING, RS256_HASH)
+            except InvalidSignature:
+                return False, None, "Invalid token signature", True
             except Exception as e:
-                return False, None, f"Token validation error: {str(e)}"
+                return False, None, f"Invalid token: {str(e)}", True
+            
+            # Decode the payload only once the signature is known to be good
+            try:
+                payload = _json_loads(_base64url_decode(payload_b64))
+            except Exception as e:
+                return False, None, f"Invalid token payload: {str(e)}", True
+            
+            if not isinstance(payload, dict):
+                return False, None, "Invalid token payload: expected a JSON object", True
+            
+            error_msg, is_permanent_failure = self._validate_claims(payload)
+            if error_msg:
+                return False, None, error_msg, is_permanent_failure
+            
+            return True, payload, None, False
             
         except Exception as e:
-            return False, None, f"JWT validation error: {str(e)}"
+            return False, None, f"JWT validation error: {str(e)}", False
+    
+    def _get_negative_result(self, token_hash):
+        """
+        Return the cached rejection message for a token, or None if missing or expired
+        """
+        with self.negative_cache_lock:
+            return self.negative_cache.get(token_hash)
     
-    def _get_public_key_from_jwks(self, keycloak_base_url, realm, kid, ssl_verify):
+    def _store_negative_result(self, token_hash, error_msg):
+        """
+        Cache a token rejection for NEGATIVE_CACHE_TTL seconds
+        """
+        with self.negative_cache_lock:
+            self.negative_cache[token_hash] = error_msg
+    
+    def _validate_claims(self, payload):
+        """
+        Validate registered claims (exp, iat, nbf, iss, aud)
+        Returns: (error_message, is_permanent_failure), error_message is None if all
+        claims are valid. iat/nbf in the future is not permanent: the token becomes
+        valid with time (or once clocks agree), so it must not be negative-cached
         """
-        Fetch public key from Keycloak JWKS endpoint
+        now = int(time.time())
+        
+        exp = payload.get('exp')
+        if exp is None:
+            return "Invalid token: Token is missing the \"exp\" claim", True
+        if not isinstance(exp, (int, float)):
+            return "Invalid token: Expiration Time claim (exp) must be an integer.", True
+        if exp <= now:
+            return "Token has expired", True
+        
+        iat = payload.get('iat')
+        if iat is None:
+            return "Invalid token: Token is missing the \"iat\" claim", True
+        if not isinstance(iat, (int, float)):
+            return "Invalid token: Issued At claim (iat) must be an integer.", True
+        if iat > now:
+            return "Invalid token: The token is not yet valid (iat)", False
+        
+        nbf = payload.get('nbf')
+        if nbf is not None:
+            if not isinstance(nbf, (int, float)):
+                return "Invalid token: Not Before claim (nbf) must be an integer.", True
+            if nbf > now:
+                return "Invalid token: The token is not yet valid (nbf)", False
+        
+        # Issuer and audience use constant-time comparisons
+        issuer = payload.get('iss')
+        if not isinstance(issuer, str) or not hmac.compare_digest(issuer.encode('utf-8'), self.expected_issuer_bytes):
+            return f"Invalid issuer: expected {self.expected_issuer}", True
+        
+        audience = payload.get('aud')
+        if isinstance(audience, str):
+            audience = [audience]
+        if not isinstance(audience, list) or not any(
+            isinstance(aud, str) and hmac.compare_digest(aud.encode('utf-8'), self.expected_audience_bytes)
+            for aud in audience
+        ):
+            return f"Invalid audience: expected {self.expected_audience}", True
+        
+        return None, False
+    
+    def _get_public_key_from_jwks(self, kid, kong):
+        """
+        Look up the public key for kid, fetching JWKS from Keycloak if needed
         Returns: (public_key, error_message)
         """
         try:
             # Check cache first
-            current_time = time.time()
-            cache_key = f"{keycloak_base_url}/{realm}"
+            keys = self.jwks.keys
             
-            if (cache_key in self.jwks_cache and 
-                current_time < self.cache_expiry):
-                jwks = self.jwks_cache[cache_key]
-            else:
+            if keys is None or time.time() >= self.jwks.expiry:
                 # Fetch JWKS from Keycloak
-                jwks_url = f"{keycloak_base_url}/realms/{realm}/protocol/openid-connect/certs"
+                keys, error_msg = self._refresh_jwks(kong)
                 
-                try:
-                    response = requests.get(jwks_url, verify=ssl_verify, timeout=10)
-                    response.raise_for_status()
-                    jwks = response.json()
-                    
-                    # Cache the JWKS
-                    self.jwks_cache[cache_key] = jwks
-                    self.cache_expiry = current_time + self.cache_ttl
-                    
-                except requests.RequestException as e:
-                    return None, f"Failed to fetch JWKS from {jwks_url}: {str(e)}"
-                except json.JSONDecodeError as e:
-                    return None, f"Invalid JWKS response from {jwks_url}: {str(e)}"
-            
-            # Find the key with matching kid
-            keys = jwks.get('keys', [])
-            target_key = None
+                if keys is None:
+                    return None, error_msg
             
-            for key in keys:
-                if key.get('kid') == kid:
-                    target_key = key
-                    break
+            public_key = keys.get(kid)
+            if public_key is None:
+                # The kid may belong to a key Keycloak just rotated in; refetch
+                # instead of waiting for the background refresh
+                public_key = self._refresh_jwks_for_unknown_kid(kong).get(kid)
             
-            if not target_key:
+            if public_key is None:
                 return None, f"Key with kid '{kid}' not found in JWKS"
             
-            # Validate key properties
-            if target_key.get('kty') != 'RSA':
-                return None, f"Unsupported key type: {target_key.get('kty')}"
-            
-            if target_key.get('use') not in ['sig', None]:
-                return None, f"Key not for signature use: {target_key.get('use')}"
-            
-            # Extract RSA key components
-            try:
-                n = target_key.get('n')  # Modulus
-                e = target_key.get('e')  # Exponent
-                
-                if not n or not e:
-                    return None, "Missing RSA key components (n or e)"
-                
-                # Decode base64url values
-                n_bytes = self._base64url_decode(n)
-                e_bytes = self._base64url_decode(e)
-                
-                # Convert to integers
-                n_int = int.from_bytes(n_bytes, byteorder='big')
-                e_int = int.from_bytes(e_bytes, byteorder='big')
-                
-                # Create RSA public key
-                public_numbers = rsa.RSAPublicNumbers(e_int, n_int)
-                public_key = public_numbers.public_key()
-                
-                return public_key, None
-                
-            except Exception as e:
-                return None, f"Failed to construct RSA public key: {str(e)}"
+            return public_key, None
             
         except Exception as e:
             return None, f"Error getting public key from JWKS: {str(e)}"
     
-    def _base64url_decode(self, data):
+    def _refresh_jwks(self, kong):
         """
-        Decode base64url encoded data
+        Fetch JWKS from Keycloak, letting only one request per realm refresh at a time
+        Serves the previous JWKS if the refresh fails
+        Returns: ({kid: public_key}, error_message)
         """
-        # Add padding if needed
-        padding = 4 - len(data) % 4
-        if padding != 4:
-            data += '=' * padding
+        realm = self.jwks
         
-        return base64.urlsafe_b64decode(data)
+        with realm.lock:
+            # Another request may have refreshed the JWKS while we waited for the lock
+            if realm.keys is not None and time.time() < realm.expiry:
+                return realm.keys, None
+            
+            error_msg = realm.fetch()
+            if error_msg is None:
+                return realm.keys, None
+            
+            stale_keys = realm.keys
+            if stale_keys is None:
+                return None, error_msg
+            
+            # Keep serving the stale JWKS and retry the refresh a little later
+            # instead of making every waiting request hit Keycloak again
+            kong.log.warn(f"[custom-jwt] {error_msg}, serving cached JWKS")
+            realm.expiry = time.time() + min(realm.cache_ttl, JWKS_RETRY_INTERVAL)
+            return stale_keys, None
     
+    def _refresh_jwks_for_unknown_kid(self, kong):
+        """
+        Force a JWKS refetch after a kid miss, at most once per JWKS_RETRY_INTERVAL
+        per realm so tokens with bogus kids cannot make every request hit Keycloak
+        Returns: {kid: public_key}, the current keys if the refetch is skipped or fails
+        """
+        realm = self.jwks
+        
+        with realm.lock:
+            now = time.time()
+            if now - realm.last_forced_refresh >= JWKS_RETRY_INTERVAL:
+                realm.last_forced_refresh = now
+                error_msg = realm.fetch()
+                if error_msg is not None:
+                    kong.log.warn(f"[custom-jwt] {error_msg}, serving cached JWKS")
+            
+            return realm.keys or {}
@@ -0,0 +1,182 @@
+"""
+Unit tests for the custom-jwt-auth token checks
+Run from kong/helm-chart/python-plugins: python -m unittest discover tests
+"""
+
+import base64
+import importlib.util
+import json
+import os
+import time
+import unittest
+from unittest import mock
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+PLUGIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "custom-jwt-auth.py")
+
+ISSUER = "https://keycloak.test/realms/kong"
+AUDIENCE = "account"
+KID = "test-key"
+
+PLUGIN = None
+PRIVATE_KEY = None
+
+
+def _load_plugin_module():
+    """
+    Import custom-jwt-auth.py, whose name is not a valid module name
+    """
+    spec = importlib.util.spec_from_file_location("custom_jwt_auth", PLUGIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _int_b64url(value):
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+
+def _sign(private_key, header, claims):
+    """
+    Build a compact RS256 JWT from a header and claims
+    """
+    signing_input = f"{_b64url(json.dumps(header).encode())}.{_b64url(json.dumps(claims).encode())}"
+    signature = private_key.sign(signing_input.encode('ascii'), padding.PKCS1v15(), hashes.SHA256())
+    return f"{signing_input}.{_b64url(signature)}"
+
+
+def setUpModule():
+    global PLUGIN, PRIVATE_KEY
+
+    module = _load_plugin_module()
+    PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = PRIVATE_KEY.public_key().public_numbers()
+    jwks = {"keys": [{"kid": KID, "kty": "RSA", "use": "sig", "n": _int_b64url(numbers.n), "e": _int_b64url(numbers.e)}]}
+
+    # Serve the test JWKS instead of calling Keycloak
+    module._SESSION.get = mock.Mock(return_value=mock.Mock(content=json.dumps(jwks).encode()))
+
+    PLUGIN = module.Plugin({
+        "keycloak_base_url": "https://keycloak.test",
+        "keycloak_realm": "kong",
+        "expected_issuer": ISSUER,
+        "expected_audience": AUDIENCE,
+    })
+
+
+class ValidateJwtTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = PLUGIN
+        self.kong = mock.Mock()
+
+    def _claims(self, **overrides):
+        now = int(time.time())
+        claims = {"sub": "user-1", "iss": ISSUER, "aud": [AUDIENCE, "other"], "iat": now - 5, "exp": now + 60}
+        claims.update(overrides)
+        return claims
+
+    def _token(self, header=None, key=None, **overrides):
+        header = {"alg": "RS256", "typ": "JWT", "kid": KID} if header is None else header
+        return _sign(key or PRIVATE_KEY, header, self._claims(**overrides))
+
+    def test_valid_token(self):
+        is_valid, payload, error_msg, _ = self.plugin._validate_jwt(self._token(), self.kong)
+        self.assertTrue(is_valid)
+        self.assertIsNone(error_msg)
+        self.assertEqual(payload["sub"], "user-1")
+
+    def test_audience_as_string(self):
+        is_valid, _, _, _ = self.plugin._validate_jwt(self._token(aud=AUDIENCE), self.kong)
+        self.assertTrue(is_valid)
+
+    def test_expired_token(self):
+        is_valid, _, error_msg, is_permanent = self.plugin._validate_jwt(self._token(exp=int(time.time()) - 1), self.kong)
+        self.assertFalse(is_valid)
+        self.assertEqual(error_msg, "Token has expired")
+        self.assertTrue(is_permanent)
+
+    def test_wrong_issuer(self):
+        is_valid, _, error_msg, _ = self.plugin._validate_jwt(self._token(iss="https://evil.test/realms/kong"), self.kong)
+        self.assertFalse(is_valid)
+        self.assertIn("Invalid issuer", error_msg)
+
+    def test_wrong_audience(self):
+        is_valid, _, error_msg, _ = self.plugin._validate_jwt(self._token(aud="other"), self.kong)
+        self.assertFalse(is_valid)
+        self.assertIn("Invalid audience", error_msg)
+
+    def test_forged_signature(self):
+        forger = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        is_valid, _, error_msg, is_permanent = self.plugin._validate_jwt(self._token(key=forger), self.kong)
+        self.assertFalse(is_valid)
+        self.assertEqual(error_msg, "Invalid token signature")
+        self.assertTrue(is_permanent)
+
+    def test_tampered_payload(self):
+        header_b64, _, signature_b64 = self._token().split('.')
+        payload_b64 = _b64url(json.dumps(self._claims(sub="admin")).encode())
+        is_valid, _, error_msg, _ = self.plugin._validate_jwt(f"{header_b64}.{payload_b64}.{signature_b64}", self.kong)
+        self.assertFalse(is_valid)
+        self.assertEqual(error_msg, "Invalid token signature")
+
+    def test_missing_alg(self):
+        is_valid, _, error_msg, _ = self.plugin._validate_jwt(self._token(header={"typ": "JWT", "kid": KID}), self.kong)
+        self.assertFalse(is_valid)
+        self.assertEqual(error_msg, "Unsupported algorithm: None")
+
+    def test_other_alg(self):
+        for alg in ("HS256", "none", "rs256"):
+            is_valid, _, error_msg, _ = self.plugin._validate_jwt(self._token(header={"alg": alg, "kid": KID}), self.kong)
+            self.assertFalse(is_valid)
+            self.assertEqual(error_msg, f"Unsupported algorithm: {alg}")
+
+    def test_missing_kid(self):
+        is_valid, _, error_msg, _ = self.plugin._validate_jwt(self._token(header={"alg": "RS256"}), self.kong)
+        self.assertFalse(is_valid)
+        self.assertEqual(error_msg, "Missing key ID (kid) in JWT header")
+
+
+class ValidateClaimsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = PLUGIN
+
+    def _claims(self, **overrides):
+        now = int(time.time())
+        claims = {"iss": ISSUER, "aud": AUDIENCE, "iat": now - 5, "exp": now + 60}
+        claims.update(overrides)
+        return {k: v for k, v in claims.items() if v is not None}
+
+    def test_valid_claims(self):
+        self.assertEqual(self.plugin._validate_claims(self._claims()), (None, False))
+
+    def test_missing_exp_and_iat(self):
+        self.assertEqual(self.plugin._validate_claims(self._claims(exp=None))[1], True)
+        self.assertEqual(self.plugin._validate_claims(self._claims(iat=None))[1], True)
+
+    def test_non_numeric_exp(self):
+        error_msg, is_permanent = self.plugin._validate_claims(self._claims(exp="tomorrow"))
+        self.assertIn("(exp) must be an integer", error_msg)
+        self.assertTrue(is_permanent)
+
+    def test_not_yet_valid_is_not_permanent(self):
+        future = int(time.time()) + 30
+        for claims in (self._claims(iat=future), self._claims(nbf=future)):
+            error_msg, is_permanent = self.plugin._validate_claims(claims)
+            self.assertIn("not yet valid", error_msg)
+            self.assertFalse(is_permanent)
+
+    def test_audience_list_without_expected(self):
+        error_msg, _ = self.plugin._validate_claims(self._claims(aud=["other", 42]))
+        self.assertIn("Invalid audience", error_msg)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,208 +2,460 @@
 
 import os
 import jwt
+import base64
+import time
+import hashlib
+import itertools
 import logging
+import threading
+import orjson
+from functools import partial
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import TTLCache
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from datetime import datetime
 from functools import wraps
 
-# Configure logging with enhanced format for debugging
+# Configure logging; set LOG_LEVEL=DEBUG to get the detailed request traces.
+# An unknown level falls back to INFO instead of failing the import
+REQUESTED_LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVEL = REQUESTED_LOG_LEVEL if isinstance(logging.getLevelName(REQUESTED_LOG_LEVEL), int) else 'INFO'
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(funcName)s() - %(message)s'
 )
 logger = logging.getLogger(__name__)
+if LOG_LEVEL != REQUESTED_LOG_LEVEL:
+    logger.warning(f"Unknown LOG_LEVEL {REQUESTED_LOG_LEVEL!r}, falling back to INFO")
 
 # Set specific loggers to appropriate levels
 logging.getLogger('urllib3').setLevel(logging.WARNING)
 logging.getLogger('requests').setLevel(logging.WARNING)
 
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify()"""
+    OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand the encoded bytes straight to the response, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.OPTIONS), mimetype='application/json')
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 SERVICE_NAME = "auth-service"
 SERVICE_VERSION = "1.0.0"
 
-logger.info(f"Starting {SERVICE_NAME} v{SERVICE_VERSION} with debug logging enabled")
+# Health body never changes, so serialize it once for the frequent probes
+HEALTH_BODY = orjson.dumps({
+    "status": "healthy",
+    "service": SERVICE_NAME,
+    "version": SERVICE_VERSION
+})
+
+logger.info(f"Starting {SERVICE_NAME} v{SERVICE_VERSION} with log level {LOG_LEVEL}")
 
 # Configuration
 KEYCLOAK_BASE_URL = 'https://d1df8d9f5a76.ngrok-free.app'
 KEYCLOAK_REALM = os.environ.get('KEYCLOAK_REALM', 'kong')
 JWKS_URL = f"{KEYCLOAK_BASE_URL}/realms/{KEYCLOAK_REALM}/protocol/openid-connect/certs"
+EXPECTED_AUDIENCE = 'account'
+EXPECTED_ISSUER = "http://d1df8d9f5a76.ngrok-free.app/realms/kong"  # logged only, not enforced
 
-# Simple in-memory cache for demonstration
+# RS256 signature verifiers by kid, refreshed in the background and swapped
+# atomically; readers never block on the network once the first fetch succeeded
 public_keys_cache = {}
-cache_expiry = None
+public_key_params = {}  # kid -> (n, e) the cached verifier was built from
+jwks_etag = None
+jwks_digest = None      # sha256 of the last parsed JWKS body
+jwks_lock = threading.Lock()  # single-flight guard for JWKS fetches
+jwks_failed_at = None   # time.monotonic() of the last failed fetch
+JWKS_REFRESH_INTERVAL = 3300  # seconds between background refreshes
+JWKS_RETRY_INTERVAL = 30      # seconds before retrying a failed refresh
+
+# Persistent session so JWKS refreshes reuse the keep-alive connection
+JWKS_TIMEOUT = (2, 5)  # (connect, read) seconds
+jwks_session = requests.Session()
+jwks_session.mount('https://', HTTPAdapter(
+    pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+))
+
+# RS256 verification parameters and the claims every token must carry
+RS256_PADDING = padding.PKCS1v15()
+RS256_HASH = hashes.SHA256()
+REQUIRED_CLAIMS = ('exp', 'iat', 'sub', 'aud')
+
+# Verified token cache: blake2b(token) -> (expires_at, decoded_token)
+# Entries never outlive the token's own exp claim
+TOKEN_CACHE_TTL = 30
+token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+token_cache_lock = threading.RLock()
+
+# Upper bound (seconds) callers may cache a granted /auth/verify decision
+AUTH_DECISION_MAX_AGE = 10
+
+# Tokens that failed signature verification, so replayed forgeries do not
+# cost an RSA verify each time: blake2b(token) -> True
+NEGATIVE_CACHE_TTL = 2
+bad_token_cache = TTLCache(maxsize=10000, ttl=NEGATIVE_CACHE_TTL)
+
+# Key IDs missing from the JWKS, so floods of tokens with an unknown kid are
+# dropped early; cleared whenever a new key set is published
+BAD_KID_CACHE_TTL = 60
+bad_kid_cache = TTLCache(maxsize=256, ttl=BAD_KID_CACHE_TTL)
+
+# Per-process request sequence for log correlation (next() is atomic under the GIL)
+request_counter = itertools.count(1)
+
+# Simple enterprise mapping based on client
+ENTERPRISE_MAPPING = {
+    'kong_client': 'enterprise-123',
+    'mobile_app': 'enterprise-456',
+    'web_app': 'enterprise-789'
+}
+
+# Authorization rules: (resource, method) -> roles granting access.
+# None means any authenticated user; combinations not listed fall back
+# to "user has any role". Resources are matched by substring of the path,
+# in order, so '/orders' wins over '/inventory' when both appear.
+RESOURCE_MARKERS = (('/orders', 'orders'), ('/inventory', 'inventory'))
+AUTH_RULES = {
+    ('orders', 'GET'): frozenset({'offline_access'}),         # Read access
+    ('orders', 'POST'): frozenset({'uma_authorization'}),     # Write access
+    ('orders', 'PUT'): frozenset({'default-roles-kong'}),     # Admin access
+    ('orders', 'DELETE'): frozenset({'default-roles-kong'}),  # Admin access
+    ('inventory', 'GET'): None,                               # All authenticated users can read
+    ('inventory', 'POST'): frozenset({'uma_authorization'}),  # Only authorized users can modify
+    ('inventory', 'PUT'): frozenset({'uma_authorization'}),
+    ('inventory', 'DELETE'): frozenset({'uma_authorization'}),
+}
 
 def get_public_keys():
-    """Fetch public keys from Keycloak JWKS endpoint with caching"""
-    global public_keys_cache, cache_expiry
-    
-    current_time = datetime.utcnow().timestamp()
-    logger.debug(f"get_public_keys() called at {current_time}")
+    """Return the cached public keys, fetching them only if none are loaded yet"""
+    keys = public_keys_cache
+    if keys:
+        logger.debug("Using cached public keys (%s keys cached)", len(keys))
+        return keys
     
-    # Return cached keys if still valid (cache for 1 hour)
-    if cache_expiry and current_time < cache_expiry and public_keys_cache:
-        cache_remaining = cache_expiry - current_time
-        logger.debug(f"Using cached public keys (cache expires in {cache_remaining:.2f} seconds, {len(public_keys_cache)} keys cached)")
+    # Nothing cached (startup or every fetch so far failed): fetch once and
+    # let concurrent callers wait for that result instead of fanning out.
+    # Callers arriving within JWKS_RETRY_INTERVAL of a failed fetch share that
+    # failure rather than queueing up fresh fetches; the background thread retries
+    with jwks_lock:
+        if not public_keys_cache and (
+            jwks_failed_at is None or time.monotonic() - jwks_failed_at >= JWKS_RETRY_INTERVAL
+        ):
+            refresh_public_keys()
         return public_keys_cache
+
+def refresh_public_keys():
+    """Fetch public keys from Keycloak JWKS endpoint; caller must hold jwks_lock.
+    Returns True if the cache is current, False if the fetch failed"""
+    global public_keys_cache, public_key_params, jwks_etag, jwks_digest, jwks_failed_at
     
     try:
         logger.info(f"Fetching public keys from {JWKS_URL}")
-        logger.debug(f"Request timeout: 10 seconds")
+        logger.debug("Request timeout: %s seconds (connect, read)", JWKS_TIMEOUT)
+        
+        # Revalidate with the previous ETag so an unchanged JWKS is not reparsed
+        headers = {'If-None-Match': jwks_etag} if jwks_etag and public_keys_cache else None
+        response = jwks_session.get(JWKS_URL, headers=headers, timeout=JWKS_TIMEOUT)
+        logger.debug("JWKS response status: %s", response.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("JWKS response headers: %s", dict(response.headers))
+        
+        if response.status_code == 304:
+            logger.info(f"JWKS not modified, keeping {len(public_keys_cache)} cached public keys")
+            return True
         
-        response = requests.get(JWKS_URL, timeout=10)
-        logger.debug(f"JWKS response status: {response.status_code}")
-        logger.debug(f"JWKS response headers: {dict(response.headers)}")
         response.raise_for_status()
         
+        # Servers without ETag support still resend identical bodies; skip reparsing those
+        digest = hashlib.sha256(response.content).digest()
+        if digest == jwks_digest and public_keys_cache:
+            jwks_etag = response.headers.get('ETag')
+            logger.info(f"JWKS unchanged, keeping {len(public_keys_cache)} cached public keys")
+            return True
+        
         jwks = response.json()
-        logger.debug(f"JWKS response contains {len(jwks.get('keys', []))} keys")
+        logger.debug("JWKS response contains %s keys", len(jwks.get('keys', [])))
         
         keys = {}
+        params = {}
         for i, key in enumerate(jwks.get('keys', [])):
             kid = key.get('kid')
             kty = key.get('kty')
             alg = key.get('alg')
             use = key.get('use')
-            logger.debug(f"Processing key {i+1}: kid={kid}, kty={kty}, alg={alg}, use={use}")
+            logger.debug("Processing key %s: kid=%s, kty=%s, alg=%s, use=%s", i + 1, kid, kty, alg, use)
             
             if kid:
-                keys[kid] = jwt.algorithms.RSAAlgorithm.from_jwk(key)
-                logger.debug(f"Successfully processed key with kid: {kid}")
+                params[kid] = (key.get('n'), key.get('e'))
+                if kid in public_keys_cache and public_key_params.get(kid) == params[kid]:
+                    # Same modulus and exponent as before; reuse the parsed key
+                    keys[kid] = public_keys_cache[kid]
+                    logger.debug("Reusing cached key with kid: %s", kid)
+                else:
+                    # Bind padding and hash once so verification is a single call
+                    public_key = jwt.algorithms.RSAAlgorithm.from_jwk(key)
+                    keys[kid] = partial(public_key.verify, padding=RS256_PADDING, algorithm=RS256_HASH)
+                    logger.debug("Successfully processed key with kid: %s", kid)
             else:
                 logger.warning(f"Key {i+1} has no kid, skipping")
         
+        # Swap in the new dict in one assignment; readers see old or new, never partial
         public_keys_cache = keys
-        cache_expiry = current_time + 3600  # Cache for 1 hour
+        public_key_params = params
+        jwks_etag = response.headers.get('ETag')
+        jwks_digest = digest
         
-        logger.info(f"Successfully cached {len(keys)} public keys (expires at {datetime.fromtimestamp(cache_expiry)})")
-        logger.debug(f"Cached key IDs: {list(keys.keys())}")
-        return keys
+        # Give previously unknown kids another chance against the new key set
+        with token_cache_lock:
+            bad_kid_cache.clear()
+        
+        logger.info(f"Successfully cached {len(keys)} public keys")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Cached key IDs: %s", list(keys.keys()))
+        return True
         
     except Exception as e:
+        jwks_failed_at = time.monotonic()
         logger.error(f"Failed to fetch public keys: {str(e)}")
-        logger.debug(f"Exception type: {type(e).__name__}")
-        logger.debug(f"Exception details: {e}")
+        logger.debug("Exception type: %s", type(e).__name__)
+        logger.debug("Exception details: %s", e)
         
-        # Return cached keys if available, even if expired
+        # Keep serving the previous keys (stale-while-error)
         if public_keys_cache:
-            logger.warning(f"Returning expired cached keys ({len(public_keys_cache)} keys available)")
-            logger.debug(f"Expired cache key IDs: {list(public_keys_cache.keys())}")
+            logger.warning(f"Keeping stale cached keys ({len(public_keys_cache)} keys available)")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Stale cache key IDs: %s", list(public_keys_cache.keys()))
         else:
             logger.error("No cached keys available, authentication will fail")
         
-        return public_keys_cache
+        return False
+
+def refresh_public_keys_periodically():
+    """Background loop keeping the JWKS cache warm"""
+    while True:
+        with jwks_lock:
+            refreshed = refresh_public_keys()
+        # Retry soon after a failure; otherwise wait for the next cycle
+        time.sleep(JWKS_REFRESH_INTERVAL if refreshed else JWKS_RETRY_INTERVAL)
+
+threading.Thread(target=refresh_public_keys_periodically, name="jwks-refresher", daemon=True).start()
+
+def base64url_decode(segment):
+    """Decode an unpadded base64url JWT segment"""
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+def validate_claims(claims, audience):
+    """
+    Validate registered claims the way jwt.decode did: exp, iat, sub and aud are
+    required, exp/iat/nbf are checked against the clock, aud must contain audience.
+    Raises the matching jwt exception on failure.
+    """
+    for claim in REQUIRED_CLAIMS:
+        if claim not in claims:
+            raise jwt.MissingRequiredClaimError(claim)
+    
+    now = time.time()
+    
+    exp = claims['exp']
+    if not isinstance(exp, (int, float)):
+        raise jwt.DecodeError("Expiration Time claim (exp) must be an integer.")
+    if exp <= now:
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    
+    iat = claims['iat']
+    if not isinstance(iat, (int, float)):
+        raise jwt.InvalidIssuedAtError("Issued At claim (iat) must be an integer.")
+    if iat > now:
+        raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+    
+    nbf = claims.get('nbf')
+    if nbf is not None:
+        if not isinstance(nbf, (int, float)):
+            raise jwt.DecodeError("Not Before claim (nbf) must be an integer.")
+        if nbf > now:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+    
+    aud = claims['aud']
+    if isinstance(aud, str):
+        aud = [aud]
+    if not isinstance(aud, list) or not all(isinstance(c, str) for c in aud):
+        raise jwt.InvalidAudienceError("Invalid claim format in token")
+    if audience not in aud:
+        raise jwt.InvalidAudienceError("Audience doesn't match")
 
 def verify_jwt_token(token):
     """Verify JWT token and extract claims"""
-    start_time = datetime.utcnow().timestamp()
-    logger.debug(f"Starting JWT token verification")
+    start_time = time.monotonic()
+    logger.debug("Starting JWT token verification")
     
     try:
+        # Work on bytes throughout: hashing, segment splitting and PyJWT all
+        # consume bytes, so encode once here instead of in each of them
+        if isinstance(token, str):
+            token = token.encode('ascii')
+        
         # Log original token format
-        logger.debug(f"Original token format: {'Bearer token' if token.startswith('Bearer ') else 'Raw token'} (length: {len(token)}")
+        has_bearer = token[:7] == b'Bearer '
+        logger.debug("Original token format: %s (length: %s", 'Bearer token' if has_bearer else 'Raw token', len(token))
         
         # Remove 'Bearer ' prefix if present
-        if token.startswith('Bearer '):
+        if has_bearer:
             token = token[7:]
             logger.debug("Removed 'Bearer ' prefix from token")
         
+        # Return cached claims if this token was verified recently
+        token_cache_key = hashlib.blake2b(token, digest_size=16).digest()
+        with token_cache_lock:
+            cached_entry = token_cache.get(token_cache_key)
+        
+        if cached_entry and cached_entry[0] > time.time():
+            logger.debug("Using cached verification result for token")
+            return cached_entry[1]
+        
+        with token_cache_lock:
+            recently_rejected = token_cache_key in bad_token_cache
+        if recently_rejected:
+            logger.debug("Rejecting token that recently failed signature verification")
+            return None
+        
         # Log token parts
-        token_parts = token.split('.')
-        logger.debug(f"Token has {len(token_parts)} parts (expected: 3 for JWT)")
+        token_parts = token.split(b'.')
+        logger.debug("Token has %s parts (expected: 3 for JWT)", len(token_parts))
+        if len(token_parts) != 3:
+            raise jwt.DecodeError("Not enough segments")
+        header_b64, payload_b64, signature_b64 = token_parts
         
         # Decode header to get key ID
-        unverified_header = jwt.get_unverified_header(token)
-        logger.debug(f"JWT header: {unverified_header}")
+        unverified_header = orjson.loads(base64url_decode(header_b64))
+        logger.debug("JWT header: %s", unverified_header)
         
         kid = unverified_header.get('kid')
         alg = unverified_header.get('alg')
         typ = unverified_header.get('typ')
         
-        logger.debug(f"Token details - kid: {kid}, alg: {alg}, typ: {typ}")
+        logger.debug("Token details - kid: %s, alg: %s, typ: %s", kid, alg, typ)
         
         if not kid:
             logger.error("No kid found in JWT header")
-            logger.debug(f"Available header fields: {list(unverified_header.keys())}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Available header fields: %s", list(unverified_header.keys()))
+            return None
+        
+        with token_cache_lock:
+            known_bad_kid = kid in bad_kid_cache
+        if known_bad_kid:
+            logger.debug("Rejecting token with recently unknown kid: %s", kid)
             return None
         
         # Get public keys
-        logger.debug(f"Fetching public keys for kid: {kid}")
+        logger.debug("Fetching public keys for kid: %s", kid)
         public_keys = get_public_keys()
         
-        logger.debug(f"Available public key IDs: {list(public_keys.keys()) if public_keys else 'None'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Available public key IDs: %s", list(public_keys.keys()) if public_keys else 'None')
         
         if kid not in public_keys:
+            with token_cache_lock:
+                bad_kid_cache[kid] = True
             logger.error(f"Key ID {kid} not found in public keys")
-            logger.debug(f"Token kid '{kid}' not in available keys: {list(public_keys.keys())}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Token kid '%s' not in available keys: %s", kid, list(public_keys.keys()))
             return None
         
-        logger.debug(f"Found matching public key for kid: {kid}")
+        logger.debug("Found matching public key for kid: %s", kid)
         
         # Verify token
-        expected_issuer = "http://d1df8d9f5a76.ngrok-free.app/realms/kong"
-        logger.debug(f"Verifying token with audience='account', issuer='{expected_issuer}'")
+        logger.debug("Verifying token with audience='%s', issuer='%s'", EXPECTED_AUDIENCE, EXPECTED_ISSUER)
+        
+        if alg != 'RS256':
+            raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+        
+        decoded_token = orjson.loads(base64url_decode(payload_b64))
+        if not isinstance(decoded_token, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        
+        # Reject expired tokens before paying for RSA; this only ever rejects
+        # earlier, a token failing here could never verify later
+        exp = decoded_token.get('exp')
+        if isinstance(exp, (int, float)) and exp <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        
+        # Verify the signature directly against the cached verifier, then
+        # check the claims jwt.decode used to enforce
+        try:
+            public_keys[kid](base64url_decode(signature_b64), header_b64 + b'.' + payload_b64)
+        except InvalidSignature:
+            with token_cache_lock:
+                bad_token_cache[token_cache_key] = True
+            raise jwt.InvalidSignatureError("Signature verification failed")
         
-        decoded_token = jwt.decode(
-            token,
-            public_keys[kid],
-            algorithms=['RS256'],
-            audience='account',
-            #issuer=expected_issuer
-        )
+        validate_claims(decoded_token, audience=EXPECTED_AUDIENCE)
         
         # Log token claims for debugging
-        logger.debug(f"Token successfully decoded. Claims: {list(decoded_token.keys())}")
-        logger.debug(f"Token subject: {decoded_token.get('sub')}")
-        logger.debug(f"Token audience: {decoded_token.get('aud')}")
-        logger.debug(f"Token issuer: {decoded_token.get('iss')}")
-        logger.debug(f"Token expires at: {datetime.fromtimestamp(decoded_token.get('exp', 0))}")
-        logger.debug(f"Token issued at: {datetime.fromtimestamp(decoded_token.get('iat', 0))}")
-        
-        verification_time = datetime.utcnow().timestamp() - start_time
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Token successfully decoded. Claims: %s", list(decoded_token.keys()))
+            logger.debug("Token subject: %s", decoded_token.get('sub'))
+            logger.debug("Token audience: %s", decoded_token.get('aud'))
+            logger.debug("Token issuer: %s", decoded_token.get('iss'))
+            logger.debug("Token expires at: %s", datetime.fromtimestamp(decoded_token.get('exp', 0)))
+            logger.debug("Token issued at: %s", datetime.fromtimestamp(decoded_token.get('iat', 0)))
+        
+        # Cache the verified claims, but never past the token's expiry
+        expires_at = min(time.time() + TOKEN_CACHE_TTL, decoded_token.get('exp', 0))
+        with token_cache_lock:
+            token_cache[token_cache_key] = (expires_at, decoded_token)
+        
+        verification_time = time.monotonic() - start_time
         logger.info(f"Token verified successfully for subject: {decoded_token.get('sub')} (verification took {verification_time:.3f}s)")
         
         return decoded_token
         
     except jwt.ExpiredSignatureError as e:
         logger.error("JWT token has expired")
-        logger.debug(f"Expiry error details: {e}")
+        logger.debug("Expiry error details: %s", e)
         return None
     except jwt.InvalidAudienceError as e:
         logger.error(f"Invalid audience in JWT token: {str(e)}")
-        logger.debug(f"Expected audience: 'account'")
+        logger.debug("Expected audience: '%s'", EXPECTED_AUDIENCE)
         return None
     except jwt.InvalidIssuerError as e:
         logger.error(f"Invalid issuer in JWT token: {str(e)}")
-        logger.debug(f"Expected issuer: {KEYCLOAK_BASE_URL}/realms/{KEYCLOAK_REALM}")
+        logger.debug("Expected issuer: %s/realms/%s", KEYCLOAK_BASE_URL, KEYCLOAK_REALM)
         return None
     except jwt.InvalidTokenError as e:
         logger.error(f"Invalid JWT token: {str(e)}")
-        logger.debug(f"Token error type: {type(e).__name__}")
+        logger.debug("Token error type: %s", type(e).__name__)
         return None
     except Exception as e:
-        verification_time = datetime.utcnow().timestamp() - start_time
+        verification_time = time.monotonic() - start_time
         logger.error(f"Error verifying JWT token: {str(e)} (after {verification_time:.3f}s)")
-        logger.debug(f"Exception type: {type(e).__name__}")
-        logger.debug(f"Exception details: {e}")
+        logger.debug("Exception type: %s", type(e).__name__)
+        logger.debug("Exception details: %s", e)
         return None
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    logger.debug(f"Health check requested from {request.remote_addr}")
-    logger.debug(f"Request headers: {dict(request.headers)}")
-    
-    response_data = {
-        "status": "healthy",
-        "service": SERVICE_NAME,
-        "version": SERVICE_VERSION,
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    
-    logger.debug(f"Health check response: {response_data}")
-    return jsonify(response_data), 200
+    logger.debug("Health check requested from %s", request.remote_addr)
+    return app.response_class(HEALTH_BODY, status=200, mimetype='application/json')
 
 @app.route('/auth/verify', methods=['POST'])
 def verify_auth():
@@ -216,16 +468,18 @@ def verify_auth():
         "token": "Bearer eyJ..."
     }
     """
-    start_time = datetime.utcnow().timestamp()
-    request_id = f"auth_verify_{int(start_time * 1000) % 100000}"
+    start_time = time.monotonic()
+    request_id = f"auth_verify_{os.getpid()}-{next(request_counter)}"
     
     logger.info(f"[{request_id}] Authorization verification request from {request.remote_addr}")
-    logger.debug(f"[{request_id}] Request headers: {dict(request.headers)}")
-    logger.debug(f"[{request_id}] Request content-type: {request.content_type}")
+    logger.debug("[%s] Request headers - User-Agent: %s, X-Request-ID: %s", request_id,
+                 request.headers.get('User-Agent'), request.headers.get('X-Request-ID'))
+    logger.debug("[%s] Request content-type: %s", request_id, request.content_type)
     
     try:
         data = request.get_json()
-        logger.debug(f"[{request_id}] Request payload keys: {list(data.keys()) if data else 'None'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[%s] Request payload keys: %s", request_id, list(data.keys()) if data else 'None')
         
         if not data:
             logger.warning(f"[{request_id}] No JSON payload provided")
@@ -235,8 +489,8 @@ def verify_auth():
         method = data.get('method')
         token = data.get('token')
         
-        logger.debug(f"[{request_id}] Parsed request - path: {api_path}, method: {method}, token_present: {bool(token)}")
-        logger.debug(f"[{request_id}] Token length: {len(token) if token else 0}")
+        logger.debug("[%s] Parsed request - path: %s, method: %s, token_present: %s", request_id, api_path, method, bool(token))
+        logger.debug("[%s] Token length: %s", request_id, len(token) if token else 0)
         
         if not all([api_path, method, token]):
             missing_fields = [f for f, v in [('path', api_path), ('method', method), ('token', token)] if not v]
@@ -246,56 +500,66 @@ def verify_auth():
         logger.info(f"[{request_id}] Authorization request - Path: {api_path}, Method: {method}")
         
         # Verify JWT token
-        logger.debug(f"[{request_id}] Starting JWT token verification")
+        logger.debug("[%s] Starting JWT token verification", request_id)
         decoded_token = verify_jwt_token(token)
         
         if not decoded_token:
             logger.warning(f"[{request_id}] Token verification failed for path: {api_path}")
             return jsonify({"error": "Invalid or expired token"}), 401
         
-        logger.debug(f"[{request_id}] JWT token verification successful")
+        logger.debug("[%s] JWT token verification successful", request_id)
         
         # Extract user information
         user_id = decoded_token.get('sub')
         client_id = decoded_token.get('client_id', 'unknown')
         preferred_username = decoded_token.get('preferred_username', 'unknown')
         
-        logger.debug(f"[{request_id}] Extracted user info - user_id: {user_id}, client_id: {client_id}, username: {preferred_username}")
+        logger.debug("[%s] Extracted user info - user_id: %s, client_id: %s, username: %s", request_id, user_id, client_id, preferred_username)
         
         # Business logic for authorization based on path and method
-        logger.debug(f"[{request_id}] Determining enterprise ID")
+        logger.debug("[%s] Determining enterprise ID", request_id)
         enterprise_id = determine_enterprise_id(decoded_token, api_path, method)
-        logger.debug(f"[{request_id}] Determined enterprise_id: {enterprise_id}")
+        logger.debug("[%s] Determined enterprise_id: %s", request_id, enterprise_id)
         
-        logger.debug(f"[{request_id}] Checking authorization")
+        logger.debug("[%s] Checking authorization", request_id)
         is_auth = is_authorized(decoded_token, api_path, method)
         
         if not is_auth:
             logger.warning(f"[{request_id}] User {user_id} not authorized for {method} {api_path}")
             return jsonify({"error": "Access denied"}), 403
         
-        processing_time = datetime.utcnow().timestamp() - start_time
+        processing_time = time.monotonic() - start_time
         logger.info(f"[{request_id}] Authorization successful - User: {user_id}, Enterprise: {enterprise_id} (processed in {processing_time:.3f}s)")
         
+        # Let callers cache the decision: the ETag identifies (token, path, method)
+        # and max-age never outlives the token. Only granted decisions are
+        # cacheable, and a 304 is only sent after the token has verified.
+        etag = hashlib.blake2b(f"{token}|{api_path}|{method}".encode('utf-8'), digest_size=12).hexdigest()
+        max_age = max(0, min(AUTH_DECISION_MAX_AGE, int(decoded_token['exp'] - time.time())))
+        cache_headers = {'ETag': f'"{etag}"', 'Cache-Control': f'private, max-age={max_age}'}
+        
+        if request.if_none_match.contains(etag):
+            logger.debug("[%s] If-None-Match matched, returning 304", request_id)
+            return app.response_class(status=304, headers=cache_headers)
+        
         response_data = {
             "authorized": True,
             "user_id": user_id,
             "enterprise_id": enterprise_id,
             "client_id": client_id,
             "username": preferred_username,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.utcnow()
         }
         
-        logger.debug(f"[{request_id}] Response data: {response_data}")
-        return jsonify(response_data), 200
+        logger.debug("[%s] Response data: %s", request_id, response_data)
+        return jsonify(response_data), 200, cache_headers
         
     except Exception as e:
-        processing_time = datetime.utcnow().timestamp() - start_time
+        processing_time = time.monotonic() - start_time
         logger.error(f"[{request_id}] Error in authorization verification: {str(e)} (after {processing_time:.3f}s)")
-        logger.debug(f"[{request_id}] Exception type: {type(e).__name__}")
-        logger.debug(f"[{request_id}] Exception details: {e}")
-        import traceback
-        logger.debug(f"[{request_id}] Traceback: {traceback.format_exc()}")
+        logger.debug("[%s] Exception type: %s", request_id, type(e).__name__)
+        logger.debug("[%s] Exception details: %s", request_id, e)
+        logger.debug("[%s] Traceback:", request_id, exc_info=True)
         return jsonify({"error": "Internal server error"}), 500
 
 def determine_enterprise_id(decoded_token, api_path, method):
@@ -304,24 +568,16 @@ def determine_enterprise_id(decoded_token, api_path, method):
     This is a simplified implementation - in real scenarios, this might involve
     database lookups, role mappings, etc.
     """
-    logger.debug(f"determine_enterprise_id() called for path: {api_path}, method: {method}")
+    logger.debug("determine_enterprise_id() called for path: %s, method: %s", api_path, method)
     
     # For demo purposes, we'll use a simple mapping
     client_id = decoded_token.get('client_id', '')
     user_id = decoded_token.get('sub', '')
     
-    logger.debug(f"Enterprise determination - client_id: {client_id}, user_id: {user_id}")
-    
-    # Simple enterprise mapping based on client
-    enterprise_mapping = {
-        'kong_client': 'enterprise-123',
-        'mobile_app': 'enterprise-456',
-        'web_app': 'enterprise-789'
-    }
+    logger.debug("Enterprise determination - client_id: %s, user_id: %s", client_id, user_id)
     
-    enterprise_id = enterprise_mapping.get(client_id, 'enterprise-default')
-    logger.debug(f"Mapped client_id '{client_id}' to enterprise_id '{enterprise_id}'")
-    logger.debug(f"Available enterprise mappings: {list(enterprise_mapping.keys())}")
+    enterprise_id = ENTERPRISE_MAPPING.get(client_id, 'enterprise-default')
+    logger.debug("Mapped client_id '%s' to enterprise_id '%s'", client_id, enterprise_id)
     
     return enterprise_id
 
@@ -336,45 +592,27 @@ def is_authorized(decoded_token, api_path, method):
     realm_access = decoded_token.get('realm_access', {})
     roles = realm_access.get('roles', [])
     
-    logger.debug(f"is_authorized() called for user {user_id}, path: {api_path}, method: {method}")
-    logger.debug(f"User roles: {roles}")
-    logger.debug(f"Client ID: {client_id}")
-    logger.debug(f"Full realm_access: {realm_access}")
+    logger.debug("is_authorized() called for user %s, path: %s, method: %s", user_id, api_path, method)
+    logger.debug("User roles: %s", roles)
+    logger.debug("Client ID: %s", client_id)
+    logger.debug("Full realm_access: %s", realm_access)
     
     logger.info(f"Checking authorization for user {user_id} with roles: {roles}")
     
     # Business rules for authorization
-    
-    # Orders API - requires specific roles
-    if '/orders' in api_path:
-        logger.debug(f"Checking orders API authorization for {method}")
-        if method == 'GET':
-            has_access = 'offline_access' in roles
-            logger.debug(f"Orders GET access: {has_access} (requires 'offline_access' role)")
-            return has_access  # Read access
-        elif method == 'POST':
-            has_access = 'uma_authorization' in roles
-            logger.debug(f"Orders POST access: {has_access} (requires 'uma_authorization' role)")
-            return has_access  # Write access
-        elif method in ['PUT', 'DELETE']:
-            has_access = 'default-roles-kong' in roles
-            logger.debug(f"Orders {method} access: {has_access} (requires 'default-roles-kong' role)")
-            return has_access  # Admin access
-    
-    # Inventory API - different rules
-    elif '/inventory' in api_path:
-        logger.debug(f"Checking inventory API authorization for {method}")
-        if method == 'GET':
-            logger.debug("Inventory GET access: True (all authenticated users can read)")
-            return True  # All authenticated users can read
-        elif method in ['PUT', 'POST', 'DELETE']:
-            has_access = 'uma_authorization' in roles
-            logger.debug(f"Inventory {method} access: {has_access} (requires 'uma_authorization' role)")
-            return has_access  # Only authorized users can modify
+    resource = next((name for marker, name in RESOURCE_MARKERS if marker in api_path), None)
+    if resource:
+        rule_key = (resource, method)
+        if rule_key in AUTH_RULES:
+            required_roles = AUTH_RULES[rule_key]
+            has_access = required_roles is None or not required_roles.isdisjoint(roles)
+            logger.debug("%s %s access: %s (requires %s)", rule_key[0], method, has_access,
+                         required_roles or 'any authenticated user')
+            return has_access
     
     # Default: allow if user has any valid role
     has_default_access = len(roles) > 0
-    logger.debug(f"Default authorization for {api_path}: {has_default_access} (user has {len(roles)} roles)")
+    logger.debug("Default authorization for %s: %s (user has %s roles)", api_path, has_default_access, len(roles))
     
     return has_default_access
 
@@ -387,88 +625,95 @@ def verify_token_only():
         "token": "Bearer eyJ..."
     }
     """
-    start_time = datetime.utcnow().timestamp()
-    request_id = f"token_verify_{int(start_time * 1000) % 100000}"
+    start_time = time.monotonic()
+    request_id = f"token_verify_{os.getpid()}-{next(request_counter)}"
     
     logger.info(f"[{request_id}] Token verification request from {request.remote_addr}")
-    logger.debug(f"[{request_id}] Request headers: {dict(request.headers)}")
+    logger.debug("[%s] Request headers - User-Agent: %s, X-Request-ID: %s", request_id,
+                 request.headers.get('User-Agent'), request.headers.get('X-Request-ID'))
     
     try:
         data = request.get_json()
-        logger.debug(f"[{request_id}] Request payload keys: {list(data.keys()) if data else 'None'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[%s] Request payload keys: %s", request_id, list(data.keys()) if data else 'None')
         
         if not data:
             logger.warning(f"[{request_id}] No JSON payload provided")
             return jsonify({"error": "No JSON payload provided"}), 400
         
         token = data.get('token')
-        logger.debug(f"[{request_id}] Token present: {bool(token)}, length: {len(token) if token else 0}")
+        logger.debug("[%s] Token present: %s, length: %s", request_id, bool(token), len(token) if token else 0)
         
         if not token:
             logger.warning(f"[{request_id}] Missing token field")
             return jsonify({"error": "Missing token field"}), 400
         
         # Verify JWT token
-        logger.debug(f"[{request_id}] Starting JWT token verification")
+        logger.debug("[%s] Starting JWT token verification", request_id)
         decoded_token = verify_jwt_token(token)
         
         if not decoded_token:
             logger.warning(f"[{request_id}] Token verification failed")
             return jsonify({"valid": False, "error": "Invalid or expired token"}), 401
         
-        processing_time = datetime.utcnow().timestamp() - start_time
+        processing_time = time.monotonic() - start_time
         
         response_data = {
             "valid": True,
             "user_id": decoded_token.get('sub'),
             "client_id": decoded_token.get('client_id'),
             "expires_at": decoded_token.get('exp'),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.utcnow()
         }
         
         logger.info(f"[{request_id}] Token verification successful for user {response_data['user_id']} (processed in {processing_time:.3f}s)")
-        logger.debug(f"[{request_id}] Response data: {response_data}")
+        logger.debug("[%s] Response data: %s", request_id, response_data)
         
         return jsonify(response_data), 200
         
     except Exception as e:
-        processing_time = datetime.utcnow().timestamp() - start_time
+        processing_time = time.monotonic() - start_time
         logger.error(f"[{request_id}] Error in token verification: {str(e)} (after {processing_time:.3f}s)")
-        logger.debug(f"[{request_id}] Exception type: {type(e).__name__}")
-        logger.debug(f"[{request_id}] Exception details: {e}")
-        import traceback
-        logger.debug(f"[{request_id}] Traceback: {traceback.format_exc()}")
+        logger.debug("[%s] Exception type: %s", request_id, type(e).__name__)
+        logger.debug("[%s] Exception details: %s", request_id, e)
+        logger.debug("[%s] Traceback:", request_id, exc_info=True)
         return jsonify({"error": "Internal server error"}), 500
 
 @app.errorhandler(404)
 def not_found(error):
     logger.warning(f"404 Not Found - {request.method} {request.path} from {request.remote_addr}")
-    logger.debug(f"404 Request headers: {dict(request.headers)}")
+    logger.debug("404 Request headers - User-Agent: %s, X-Request-ID: %s",
+                 request.headers.get('User-Agent'), request.headers.get('X-Request-ID'))
     
     response_data = {
         "error": "Not Found",
         "service": SERVICE_NAME,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow()
     }
     
-    logger.debug(f"404 Response: {response_data}")
+    logger.debug("404 Response: %s", response_data)
     return jsonify(response_data), 404
 
-# Add request logging middleware
-@app.before_request
+# Request logging middleware; only produces DEBUG output, so it is
+# registered only when DEBUG is enabled and costs nothing otherwise
+LOG_SKIP_PATHS = frozenset({'/health'})  # Skip health check spam
+
 def log_request_info():
-    if request.path != '/health':  # Skip health check spam
-        logger.debug(f"Incoming request: {request.method} {request.path} from {request.remote_addr}")
-        logger.debug(f"User-Agent: {request.headers.get('User-Agent', 'Unknown')}")
-        logger.debug(f"Content-Type: {request.content_type}")
+    if request.path not in LOG_SKIP_PATHS:
+        logger.debug("Incoming request: %s %s from %s", request.method, request.path, request.remote_addr)
+        logger.debug("User-Agent: %s", request.headers.get('User-Agent', 'Unknown'))
+        logger.debug("Content-Type: %s", request.content_type)
 
-@app.after_request
 def log_response_info(response):
-    if request.path != '/health':  # Skip health check spam
-        logger.debug(f"Response: {response.status_code} for {request.method} {request.path}")
-        logger.debug(f"Response Content-Type: {response.content_type}")
+    if request.path not in LOG_SKIP_PATHS:
+        logger.debug("Response: %s for %s %s", response.status_code, request.method, request.path)
+        logger.debug("Response Content-Type: %s", response.content_type)
     return response
 
+if logger.isEnabledFor(logging.DEBUG):
+    app.before_request(log_request_info)
+    app.after_request(log_response_info)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8003))
     logger.info(f"Starting Flask application on host=0.0.0.0, port={port}")
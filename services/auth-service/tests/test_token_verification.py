@@ -0,0 +1,149 @@
+"""
+Unit tests for the auth service's RS256 token verification and claim checks
+Run from services/auth-service: python -m unittest discover tests
+"""
+
+import base64
+import json
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KID = "test-key"
+
+app = None
+PRIVATE_KEY = None
+_session_patch = None
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _int_b64url(value):
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+
+def _sign(private_key, header, claims):
+    """Build a compact RS256 JWT from a header and claims"""
+    signing_input = f"{_b64url(json.dumps(header).encode())}.{_b64url(json.dumps(claims).encode())}"
+    signature = private_key.sign(signing_input.encode('ascii'), padding.PKCS1v15(), hashes.SHA256())
+    return f"{signing_input}.{_b64url(signature)}"
+
+
+def setUpModule():
+    global app, PRIVATE_KEY, _session_patch
+
+    PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = PRIVATE_KEY.public_key().public_numbers()
+    jwks = {"keys": [{"kid": KID, "kty": "RSA", "alg": "RS256", "use": "sig",
+                      "n": _int_b64url(numbers.n), "e": _int_b64url(numbers.e)}]}
+    body = json.dumps(jwks).encode()
+    response = mock.Mock(status_code=200, headers={}, content=body)
+    response.json.return_value = jwks
+
+    # Serve the test JWKS to the refresher thread started at import, instead of Keycloak
+    _session_patch = mock.patch("requests.Session.get", return_value=response)
+    _session_patch.start()
+
+    import app as app_module
+    app = app_module
+    with app.jwks_lock:
+        app.refresh_public_keys()
+
+
+def tearDownModule():
+    _session_patch.stop()
+
+
+class ValidateClaimsTest(unittest.TestCase):
+
+    def _claims(self, **overrides):
+        now = int(time.time())
+        claims = {"sub": "user-1", "aud": ["account", "other"], "iat": now - 5, "exp": now + 60}
+        claims.update(overrides)
+        return {k: v for k, v in claims.items() if v is not None}
+
+    def test_valid_claims(self):
+        self.assertIsNone(app.validate_claims(self._claims(), audience="account"))
+        self.assertIsNone(app.validate_claims(self._claims(aud="account"), audience="account"))
+
+    def test_missing_required_claim(self):
+        for claim in app.REQUIRED_CLAIMS:
+            with self.assertRaises(jwt.MissingRequiredClaimError):
+                app.validate_claims(self._claims(**{claim: None}), audience="account")
+
+    def test_expired(self):
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            app.validate_claims(self._claims(exp=int(time.time()) - 1), audience="account")
+
+    def test_not_yet_valid(self):
+        future = int(time.time()) + 30
+        with self.assertRaises(jwt.ImmatureSignatureError):
+            app.validate_claims(self._claims(iat=future), audience="account")
+        with self.assertRaises(jwt.ImmatureSignatureError):
+            app.validate_claims(self._claims(nbf=future), audience="account")
+
+    def test_wrong_audience(self):
+        with self.assertRaises(jwt.InvalidAudienceError):
+            app.validate_claims(self._claims(aud="other"), audience="account")
+        with self.assertRaises(jwt.InvalidAudienceError):
+            app.validate_claims(self._claims(aud=["account", 42]), audience="account")
+
+
+class VerifyJwtTokenTest(unittest.TestCase):
+
+    def setUp(self):
+        # Each test starts from empty verification caches
+        with app.token_cache_lock:
+            app.token_cache.clear()
+            app.bad_token_cache.clear()
+            app.bad_kid_cache.clear()
+
+    def _token(self, header=None, key=None, **overrides):
+        now = int(time.time())
+        claims = {"sub": "user-1", "aud": "account", "iat": now - 5, "exp": now + 60}
+        claims.update(overrides)
+        header = {"alg": "RS256", "typ": "JWT", "kid": KID} if header is None else header
+        return _sign(key or PRIVATE_KEY, header, claims)
+
+    def test_valid_token(self):
+        claims = app.verify_jwt_token("Bearer " + self._token())
+        self.assertIsNotNone(claims)
+        self.assertEqual(claims["sub"], "user-1")
+
+    def test_expired_token(self):
+        self.assertIsNone(app.verify_jwt_token(self._token(exp=int(time.time()) - 1)))
+
+    def test_wrong_audience(self):
+        self.assertIsNone(app.verify_jwt_token(self._token(aud="other")))
+
+    def test_forged_signature(self):
+        forger = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.assertIsNone(app.verify_jwt_token(self._token(key=forger)))
+
+    def test_tampered_payload(self):
+        header_b64, _, signature_b64 = self._token().split('.')
+        now = int(time.time())
+        payload_b64 = _b64url(json.dumps({"sub": "admin", "aud": "account", "iat": now, "exp": now + 60}).encode())
+        self.assertIsNone(app.verify_jwt_token(f"{header_b64}.{payload_b64}.{signature_b64}"))
+
+    def test_missing_or_other_alg(self):
+        self.assertIsNone(app.verify_jwt_token(self._token(header={"typ": "JWT", "kid": KID})))
+        self.assertIsNone(app.verify_jwt_token(self._token(header={"alg": "HS256", "kid": KID})))
+        self.assertIsNone(app.verify_jwt_token(self._token(header={"alg": "none", "kid": KID})))
+
+    def test_unknown_kid(self):
+        self.assertIsNone(app.verify_jwt_token(self._token(header={"alg": "RS256", "kid": "other-key"})))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import os
+import json
 import logging
 from flask import Flask, request, jsonify
 from datetime import datetime
@@ -14,15 +15,17 @@ app = Flask(__name__)
 SERVICE_NAME = "downstream-service-1"
 SERVICE_VERSION = "1.0.0"
 
+# Health body never changes, so serialize it once for the frequent probes
+HEALTH_BODY = json.dumps({
+    "status": "healthy",
+    "service": SERVICE_NAME,
+    "version": SERVICE_VERSION
+}).encode('utf-8')
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "service": SERVICE_NAME,
-        "version": SERVICE_VERSION,
-        "timestamp": datetime.utcnow().isoformat()
-    }), 200
+    return app.response_class(HEALTH_BODY, status=200, mimetype='application/json')
 
 @app.route('/api/public/service1/users', methods=['GET'])
 def get_public_users():